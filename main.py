@@ -5,16 +5,21 @@ Usage:
     python main.py                        # Full pipeline
     python main.py --complex-ids 8928     # Override complex IDs
     python main.py --scrape-only          # Skip Sheets & Notion writes
-    python main.py --sheets-only          # Use cached scrape (not yet implemented)
-    python main.py --notion-only          # Skip scrape and sheets
+    python main.py --sheets-only          # Replay today's cached scrape
+    python main.py --notion-only          # Skip scrape and sheets (uses cached scrape)
+    python main.py --no-cache             # Don't read/write .cache/ scrape pickles
 """
 
 from __future__ import annotations
 
 import argparse
 import asyncio
+import hashlib
+import pickle
 import sys
+from collections import defaultdict
 from datetime import date, timedelta
+from pathlib import Path
 
 import config
 import notion_handler
@@ -24,48 +29,88 @@ from utils import get_logger
 
 log = get_logger("main")
 
+_CACHE_DIR = Path(__file__).parent / ".cache"
+
 
 # ── Delta computation ─────────────────────────────────────────────────────────
 
+def _row_price(row: dict) -> int:
+    """Parse a Sheets row's price cell once; non-numeric → 0."""
+    raw = str(row.get("price", ""))
+    return int(raw) if raw.isdigit() else 0
+
+
+YesterdayIndex = dict[tuple[str, str], tuple[set[str], list[int]]]
+
+
+def index_yesterday(rows: list[dict]) -> YesterdayIndex:
+    """Normalise yesterday's rows once into (complex_id, trade_type) → (ids, prices).
+
+    Only positive prices are kept. Each cell is coerced exactly once, so the
+    per-summary work no longer re-parses rows.
+    """
+    index: YesterdayIndex = defaultdict(lambda: (set(), []))
+    for r in rows:
+        ids, prices = index[(str(r.get("complex_id", "")), r.get("trade_type", ""))]
+        if r.get("listing_id"):
+            ids.add(str(r["listing_id"]))
+        p = _row_price(r)
+        if p > 0:
+            prices.append(p)
+    return dict(index)
+
+
+def index_results(results: dict[str, list[Listing]]) -> dict[tuple[str, str], list[Listing]]:
+    """Partition scraped listings once into (complex_id, trade_type) → listings."""
+    by_ct: dict[tuple[str, str], list[Listing]] = {}
+    for complex_id, listings in results.items():
+        for l in listings:
+            by_ct.setdefault((complex_id, l.trade_type), []).append(l)
+    return by_ct
+
+
 def compute_summary(
     complex_id: str,
     trade_type: str,
     today_listings: list[Listing],
-    yesterday_rows: list[dict],
+    yesterday_ids: set[str],
+    yesterday_prices: list[int],
 ) -> ComplexSummary:
-    """Compute ComplexSummary with delta stats vs yesterday."""
+    """Compute ComplexSummary with delta stats vs yesterday.
+
+    `yesterday_ids` / `yesterday_prices` come from index_yesterday().
+    """
     today = date.today().isoformat()
 
-    today_ids = {l.listing_id for l in today_listings}
-    yesterday_ids = {str(r.get("listing_id", "")) for r in yesterday_rows if r.get("listing_id")}
+    # Single pass over today: ids, price sum/count, lowest listing.
+    # Price computation uses the 'price' field (deposit for B2).
+    today_ids: set[str] = set()
+    n_priced = 0
+    price_sum = 0
+    lowest: Listing | None = None
+    for l in today_listings:
+        today_ids.add(l.listing_id)
+        if l.price > 0:
+            n_priced += 1
+            price_sum += l.price
+            if lowest is None or l.price < lowest.price:
+                lowest = l
 
-    new_listings = len(today_ids - yesterday_ids)
-    removed_listings = len(yesterday_ids - today_ids)
+    avg_price = price_sum / n_priced if n_priced else 0.0
+    min_price = lowest.price if lowest else 0
 
-    # Price computation — use 'price' field (deposit for B2)
-    today_prices = [l.price for l in today_listings if l.price > 0]
-    avg_price = sum(today_prices) / len(today_prices) if today_prices else 0.0
-    min_price = min(today_prices) if today_prices else 0
+    # Yesterday averages (prices are pre-parsed and positive)
+    y_avg = sum(yesterday_prices) / len(yesterday_prices) if yesterday_prices else 0.0
+    y_min = min(yesterday_prices) if yesterday_prices else 0
 
-    # Yesterday averages
-    y_prices = [
-        int(r.get("price", 0))
-        for r in yesterday_rows
-        if r.get("price") and str(r["price"]).isdigit() and int(r["price"]) > 0
-    ]
-    y_avg = sum(y_prices) / len(y_prices) if y_prices else 0.0
-    y_min = min(y_prices) if y_prices else 0
+    new_listings = len(today_ids - yesterday_ids)
+    removed_listings = len(yesterday_ids - today_ids)
 
     avg_change = avg_price - y_avg
     avg_change_pct = (avg_change / y_avg * 100) if y_avg else 0.0
     min_change = min_price - y_min
 
     # Build lowest listing description
-    lowest: Listing | None = None
-    for l in today_listings:
-        if l.price > 0 and (lowest is None or l.price < lowest.price):
-            lowest = l
-
     lowest_str = ""
     if lowest:
         price_label = (
@@ -93,6 +138,37 @@ def compute_summary(
     )
 
 
+# ── Scrape result cache ───────────────────────────────────────────────────────
+
+def _cache_path(day: str, complex_ids: list[str], trade_types: list[str]) -> Path:
+    """Pickle path keyed by (date, complex_ids, trade_types)."""
+    key = repr((tuple(complex_ids), tuple(trade_types))).encode()
+    digest = hashlib.sha1(key).hexdigest()[:12]
+    return _CACHE_DIR / f"scrape_{day}_{digest}.pkl"
+
+
+def save_scrape_cache(path: Path, results: dict[str, list[Listing]]) -> None:
+    """Persist scrape results so --sheets-only/--notion-only can replay them."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
+        pickle.dump(results, f, protocol=5)
+    log.info("Cached scrape results to %s", path)
+
+
+def load_scrape_cache(path: Path) -> dict[str, list[Listing]] | None:
+    """Return cached scrape results, or None if absent/unreadable."""
+    try:
+        with path.open("rb") as f:
+            results = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        log.warning("Ignoring unreadable scrape cache %s: %s", path, exc)
+        return None
+    log.info("Loaded cached scrape results from %s", path)
+    return results
+
+
 # ── CLI argument parsing ───────────────────────────────────────────────────────
 
 def parse_args() -> argparse.Namespace:
@@ -117,66 +193,85 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--sheets-only",
         action="store_true",
-        help="Skip scrape and Notion — only write to Sheets (requires --listings-file)",
+        help="Skip scrape and Notion — only write to Sheets (replays today's cached scrape)",
     )
     parser.add_argument(
         "--notion-only",
         action="store_true",
         help="Skip scrape and Sheets — only write summaries to Notion",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither write nor replay the on-disk scrape cache (.cache/)",
+    )
     return parser.parse_args()
 
 
 # ── Main pipeline ─────────────────────────────────────────────────────────────
 
 async def run(args: argparse.Namespace) -> None:
-    complex_ids = args.complex_ids or config.COMPLEX_IDS
-    trade_types = args.trade_types or config.TRADE_TYPES
+    cfg = config.load_config()
+    complex_ids = list(args.complex_ids or cfg.complex_ids)
+    trade_types = list(args.trade_types or cfg.trade_types)
 
     log.info(
         "Pipeline start — complexes=%s trade_types=%s",
         complex_ids, trade_types,
     )
 
-    # ── Step 1: Scrape ─────────────────────────────────────────────────────────
+    # ── Step 1: Scrape (or replay cached scrape) ──────────────────────────────
     results: dict[str, list[Listing]] = {}
+    cache_path = _cache_path(date.today().isoformat(), complex_ids, trade_types)
     if not args.sheets_only and not args.notion_only:
         from scraper import run_scraper
         results = await run_scraper(complex_ids, trade_types)
+        if not args.no_cache:
+            save_scrape_cache(cache_path, results)
     else:
         log.info("Skipping scrape step")
+        # Replaying nothing would write all-zero summaries over today's real data
+        if args.no_cache:
+            log.error("--no-cache leaves no scrape to replay — aborting")
+            sys.exit(1)
+        cached = load_scrape_cache(cache_path)
+        if cached is None:
+            log.error("No cached scrape at %s — run a scrape first; aborting", cache_path)
+            sys.exit(1)
+        results = cached
 
     if args.scrape_only:
+        sheets_handler.clear_read_cache()
         log.info("--scrape-only: done.")
         return
 
-    # ── Step 2: Write to Google Sheets ────────────────────────────────────────
-    if not args.notion_only:
-        all_listings = [l for listings in results.values() for l in listings]
-        log.info("Writing %d total listings to Google Sheets", len(all_listings))
-        sheets_handler.write_listings(all_listings)
+    # One client/spreadsheet open shared by the Sheets write and yesterday read
+    with sheets_handler.pipeline_session() as (_, sh):
+        # ── Step 2: Write to Google Sheets ────────────────────────────────────
+        if not args.notion_only:
+            all_listings = [l for listings in results.values() for l in listings]
+            log.info("Writing %d total listings to Google Sheets", len(all_listings))
+            sheets_handler.write_listings(all_listings, sh=sh)
 
-    # ── Step 3: Compute summaries & write to Notion ───────────────────────────
-    summaries: list[ComplexSummary] = []
+        if args.sheets_only:
+            log.info("--sheets-only: done.")
+            return
 
-    # Need spreadsheet handle for reading yesterday
-    sh = sheets_handler.get_spreadsheet()
-    yesterday = (date.today() - timedelta(days=1)).isoformat()
+        # ── Step 3: Compute summaries & write to Notion ───────────────────────
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
 
-    for complex_id in complex_ids:
-        complex_listings = results.get(complex_id, [])
+        # Read yesterday's tab once and index rows by (complex_id, trade_type)
+        yesterday_index = index_yesterday(sheets_handler.read_worksheet(sh, yesterday))
 
-        for trade_type in trade_types:
-            type_listings = [l for l in complex_listings if l.trade_type == trade_type]
+    summaries: list[ComplexSummary] = []
+    by_ct = index_results(results)
 
-            yesterday_rows = sheets_handler.read_worksheet(sh, yesterday)
-            yesterday_rows = [
-                r for r in yesterday_rows
-                if str(r.get("complex_id")) == complex_id
-                and r.get("trade_type") == trade_type
-            ]
+    for complex_id in complex_ids:
+        for trade_type in trade_types:
+            type_listings = by_ct.get((complex_id, trade_type), [])
+            y_ids, y_prices = yesterday_index.get((complex_id, trade_type), (set(), []))
 
-            summary = compute_summary(complex_id, trade_type, type_listings, yesterday_rows)
+            summary = compute_summary(complex_id, trade_type, type_listings, y_ids, y_prices)
             summaries.append(summary)
             log.info(
                 "Summary: complex=%s trade=%s total=%d new=%d removed=%d avg=%.0f",
@@ -185,7 +280,7 @@ async def run(args: argparse.Namespace) -> None:
                 summary.removed_listings, summary.avg_price,
             )
 
-    notion_handler.write_summaries(summaries)
+    await notion_handler.write_summaries(summaries)
     log.info("Pipeline complete.")
 
 
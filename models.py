@@ -1,10 +1,10 @@
 """Dataclasses for Naver Real Estate scraping pipeline."""
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Listing:
     """Represents a single apartment listing from Naver Real Estate."""
 
@@ -33,7 +33,7 @@ class Listing:
     tags: str = ""           # comma-joined tags
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ComplexSummary:
     """Aggregated daily summary for one complex + trade type, written to Notion."""
 
@@ -2,14 +2,18 @@
 Notion dashboard handler.
 
 Creates/updates a Notion database with daily per-complex summaries.
-One row per complex × trade_type × date.
+One row per complex × trade_type × date. Uses the async Notion client so
+page writes can run concurrently within the integration's rate limit.
 """
 
 from __future__ import annotations
 
-import time
+import asyncio
+import random
+from typing import Any, Awaitable, Callable
 
-from notion_client import Client
+from aiolimiter import AsyncLimiter
+from notion_client import APIResponseError, AsyncClient
 
 import config
 from models import ComplexSummary
@@ -17,7 +21,45 @@ from utils import get_logger
 
 log = get_logger("notion")
 
-_RATE_LIMIT_SLEEP = 0.35  # 350ms between API calls
+_REQUESTS_PER_SECOND = 3  # Notion allows ~3 req/s per integration
+_MAX_CONCURRENT_WRITES = 3
+
+# Retry policy for rate-limited (429) Notion calls
+_MAX_ATTEMPTS = 5
+_BACKOFF_BASE = 1.0   # seconds
+_BACKOFF_CAP = 60.0   # seconds
+
+
+# ── Rate limiting / retries ────────────────────────────────────────────────────
+
+async def _with_retry(
+    limiter: AsyncLimiter, fn: Callable[..., Awaitable[Any]], **kwargs: Any
+) -> Any:
+    """Call a Notion API method through the shared limiter, retrying 429s.
+
+    Every attempt first reserves a slot on `limiter`. Only rate-limit errors
+    are retried — Notion rejects those without applying the request, so a
+    retried pages.create can't duplicate a page. Honours Retry-After when
+    present; otherwise waits min(_BACKOFF_CAP, _BACKOFF_BASE * 2**attempt)
+    plus up to 1s of jitter.
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        await limiter.acquire()
+        try:
+            return await fn(**kwargs)
+        except APIResponseError as exc:
+            if exc.status != 429 or attempt == _MAX_ATTEMPTS - 1:
+                raise
+            retry_after = exc.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = min(_BACKOFF_CAP, float(retry_after))
+            else:
+                delay = min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt) + random.uniform(0, 1)
+            log.warning(
+                "Notion API 429 (attempt %d/%d) — retrying in %.1fs",
+                attempt + 1, _MAX_ATTEMPTS, delay,
+            )
+            await asyncio.sleep(delay)
 
 
 # ── Database schema definition ─────────────────────────────────────────────────
@@ -50,21 +92,24 @@ def _db_properties_schema() -> dict:
 
 # ── Database setup ─────────────────────────────────────────────────────────────
 
-def get_or_create_database(notion: Client) -> str:
+async def get_or_create_database(notion: AsyncClient, limiter: AsyncLimiter) -> str:
     """Return existing DB ID or create a new one under NOTION_PARENT_PAGE_ID.
 
     Logs newly created DB ID so user can set NOTION_DATABASE_ID in .env.
     """
-    db_id = config.NOTION_DATABASE_ID
+    cfg = config.load_config()
+    db_id = cfg.notion_database_id
     if db_id:
         log.info("Using existing Notion database: %s", db_id)
         return db_id
 
-    parent_id = config.NOTION_PARENT_PAGE_ID
+    parent_id = cfg.notion_parent_page_id
     if not parent_id:
         raise ValueError("Set NOTION_PARENT_PAGE_ID in .env")
 
-    resp = notion.databases.create(
+    resp = await _with_retry(
+        limiter,
+        notion.databases.create,
         parent={"type": "page_id", "page_id": parent_id},
         title=[{"type": "text", "text": {"content": "Naver Real Estate Dashboard"}}],
         properties=_db_properties_schema(),
@@ -100,44 +145,77 @@ def _build_properties(summary: ComplexSummary) -> dict:
 
 # ── Upsert logic ───────────────────────────────────────────────────────────────
 
-def upsert_summary(notion: Client, db_id: str, summary: ComplexSummary) -> None:
-    """Query for existing page with same complex_id + date + trade_type.
+PageKey = tuple[str, str, str]  # (complex_id, date, trade_type)
 
-    Creates a new page if not found, otherwise updates the existing one.
+
+def _page_key(page: dict) -> PageKey | None:
+    """Extract (complex_id, date, trade_type) from a database page."""
+    props = page.get("properties", {})
+    try:
+        complex_id = props["Complex ID"]["rich_text"][0]["plain_text"]
+        day = props["Date"]["date"]["start"]
+        trade_type = props["Trade Type"]["select"]["name"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return complex_id, day, trade_type
+
+
+async def fetch_existing_pages(
+    notion: AsyncClient, limiter: AsyncLimiter, db_id: str, day: str
+) -> dict[PageKey, str]:
+    """Return {(complex_id, date, trade_type): page_id} for all rows on `day`.
+
+    Paginates through the database query once instead of querying per summary.
     """
-    # Query for existing row
-    query_resp = notion.databases.query(
-        database_id=db_id,
-        filter={
-            "and": [
-                {
-                    "property": "Complex ID",
-                    "rich_text": {"equals": summary.complex_id},
-                },
-                {
-                    "property": "Date",
-                    "date": {"equals": summary.date},
-                },
-                {
-                    "property": "Trade Type",
-                    "select": {"equals": summary.trade_type},
-                },
-            ]
-        },
-    )
+    existing: dict[PageKey, str] = {}
+    cursor: str | None = None
+    while True:
+        kwargs: dict = dict(
+            database_id=db_id,
+            filter={"property": "Date", "date": {"equals": day}},
+            page_size=100,
+        )
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        resp = await _with_retry(limiter, notion.databases.query, **kwargs)
+
+        for page in resp.get("results", []):
+            key = _page_key(page)
+            if key and key not in existing:
+                existing[key] = page["id"]
+
+        if not resp.get("has_more"):
+            break
+        cursor = resp.get("next_cursor")
+
+    log.info("Found %d existing Notion pages for %s", len(existing), day)
+    return existing
+
+
+async def upsert_summary(
+    notion: AsyncClient,
+    limiter: AsyncLimiter,
+    db_id: str,
+    summary: ComplexSummary,
+    existing: dict[PageKey, str],
+) -> None:
+    """Update the page matching complex_id + date + trade_type, or create one.
 
+    `existing` is the lookup built by fetch_existing_pages().
+    """
     properties = _build_properties(summary)
-    results = query_resp.get("results", [])
+    page_id = existing.get((summary.complex_id, summary.date, summary.trade_type))
 
-    if results:
-        page_id = results[0]["id"]
-        notion.pages.update(page_id=page_id, properties=properties)
+    if page_id:
+        await _with_retry(limiter, notion.pages.update, page_id=page_id, properties=properties)
         log.info(
             "Updated Notion page: complex=%s date=%s trade=%s",
             summary.complex_id, summary.date, summary.trade_type,
         )
     else:
-        notion.pages.create(
+        await _with_retry(
+            limiter,
+            notion.pages.create,
             parent={"database_id": db_id},
             properties=properties,
         )
@@ -149,21 +227,35 @@ def upsert_summary(notion: Client, db_id: str, summary: ComplexSummary) -> None:
 
 # ── Top-level entry point ─────────────────────────────────────────────────────
 
-def write_summaries(summaries: list[ComplexSummary]) -> None:
-    """Write all summaries to Notion with rate-limit throttling."""
-    token = config.NOTION_TOKEN
+async def write_summaries(summaries: list[ComplexSummary]) -> None:
+    """Write all summaries to Notion.
+
+    Up to _MAX_CONCURRENT_WRITES upserts run at once, and every API call
+    (lookups included) is paced by one shared _REQUESTS_PER_SECOND limiter.
+    """
+    token = config.load_config().notion_token
     if not token:
         raise ValueError("Set NOTION_TOKEN in .env")
 
-    notion = Client(auth=token)
-    db_id = get_or_create_database(notion)
+    limiter = AsyncLimiter(_REQUESTS_PER_SECOND, 1.0)
+    async with AsyncClient(auth=token) as notion:
+        db_id = await get_or_create_database(notion, limiter)
+
+        if not summaries:
+            log.info("No summaries to write")
+            return
+
+        # One paginated lookup per date instead of one query per summary
+        existing: dict[PageKey, str] = {}
+        for day in sorted({s.date for s in summaries}):
+            existing.update(await fetch_existing_pages(notion, limiter, db_id, day))
+
+        sem = asyncio.Semaphore(_MAX_CONCURRENT_WRITES)
 
-    if not summaries:
-        log.info("No summaries to write")
-        return
+        async def bounded_upsert(summary: ComplexSummary) -> None:
+            async with sem:
+                await upsert_summary(notion, limiter, db_id, summary, existing)
 
-    for summary in summaries:
-        upsert_summary(notion, db_id, summary)
-        time.sleep(_RATE_LIMIT_SLEEP)
+        await asyncio.gather(*(bounded_upsert(s) for s in summaries))
 
     log.info("Wrote %d summaries to Notion", len(summaries))
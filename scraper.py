@@ -1,20 +1,29 @@
 """
-Playwright stealth scraper for Naver Real Estate.
+Naver Real Estate scraper: Playwright warm-up + aiohttp fetch loop.
 
-Uses page.evaluate(fetch(...)) inside the browser context to call Naver's
-internal XHR API — avoids DOM parsing fragility and satisfies auth cookies.
+A stealth Chromium page visits each complex once to obtain Naver's session
+cookies; those cookies are copied into an aiohttp session which then calls
+the internal XHR API directly — avoids DOM parsing fragility and keeps the
+per-request cost to a plain HTTP GET.
 """
 
 from __future__ import annotations
 
 import asyncio
-import json
 import random
-from datetime import date
-from typing import Any
-
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from typing import Any, Iterable
+
+import aiohttp
+from aiohttp_socks import ProxyConnector
+from aiolimiter import AsyncLimiter
 from playwright.async_api import Browser, BrowserContext, Page, async_playwright
 from playwright_stealth import stealth_async
+from yarl import URL
 
 import config
 from models import Listing
@@ -36,27 +45,28 @@ _USER_AGENTS = [
 
 # ── Price parsing ──────────────────────────────────────────────────────────────
 
+# '[N억][ ][M]' with optional thousands separators, e.g. '15억 5,000'. The
+# remainder only counts when it runs to the end of the string, so a suffix
+# like '15억5천' falls back to the 억 part alone.
+_PRICE_RE = re.compile(r"^\s*(?:(\d[\d,]*)\s*억)?\s*(?:(\d[\d,]*)\s*$)?")
+
+
 def _parse_korean_price(s: str) -> int:
     """Convert Korean price string to 만원 integer.
 
     Examples:
-        '15억'      → 150000
-        '15억 5000' → 155000
-        '5,000'     → 5000
-        '5000'      → 5000
+        '15억'       → 150000
+        '15억 5000'  → 155000
+        '15억5천'    → 150000  (non-numeric remainder falls back to 억)
+        '15억5000만' → 150000
+        '5,000'      → 5000
+        '5000'       → 5000
     """
-    s = s.strip().replace(",", "").replace(" ", "")
-    if not s:
-        return 0
-    if "억" in s:
-        parts = s.split("억")
-        eok = int(parts[0]) * 10000
-        remainder = int(parts[1]) if parts[1].isdigit() and parts[1] else 0
-        return eok + remainder
-    try:
-        return int(s)
-    except ValueError:
-        return 0
+    eok, rest = _PRICE_RE.match(s).groups()
+    total = int(eok.replace(",", "")) * 10000 if eok else 0
+    if rest:
+        total += int(rest.replace(",", ""))
+    return total
 
 
 def _parse_price_field(raw: str, trade_type: str) -> tuple[int, int]:
@@ -76,21 +86,26 @@ def _parse_price_field(raw: str, trade_type: str) -> tuple[int, int]:
 
 # ── Browser setup ──────────────────────────────────────────────────────────────
 
-async def build_browser_context(browser: Browser) -> BrowserContext:
-    """Create a stealth Chromium context with randomised UA."""
-    ua = random.choice(_USER_AGENTS)
+_NAVER_ORIGIN = "https://new.land.naver.com/"
+_ACCEPT_LANGUAGE = "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7"
+
+
+async def build_browser_context(browser: Browser, ua: str | None = None) -> BrowserContext:
+    """Create a stealth Chromium context with the given (or a random) UA."""
+    ua = ua or random.choice(_USER_AGENTS)
     kwargs: dict = dict(
         user_agent=ua,
         viewport={"width": 1366 + random.randint(0, 200), "height": 768 + random.randint(0, 100)},
         locale="ko-KR",
         timezone_id="Asia/Seoul",
         extra_http_headers={
-            "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
+            "Accept-Language": _ACCEPT_LANGUAGE,
         },
     )
-    if config.PROXY_URL:
-        kwargs["proxy"] = {"server": config.PROXY_URL}
-        log.info("Using proxy: %s", config.PROXY_URL)
+    proxy_url = config.load_config().proxy_url
+    if proxy_url:
+        kwargs["proxy"] = {"server": proxy_url}
+        log.info("Using proxy: %s", proxy_url)
     context = await browser.new_context(**kwargs)
     return context
 
@@ -101,80 +116,152 @@ async def warm_up_session(page: Page, complex_id: str) -> None:
     log.info("Warming up session for complex %s", complex_id)
     try:
         await page.goto(url, wait_until="domcontentloaded", timeout=30_000)
-        await async_random_sleep(2.0, 4.0)
+        # Full settle wait so the page's JS has set its cookies before we copy them
+        await asyncio.sleep(random.uniform(2.0, 4.0))
     except Exception as exc:
         log.warning("Warm-up navigation failed (non-fatal): %s", exc)
 
 
-# ── XHR fetch via page.evaluate ───────────────────────────────────────────────
+async def copy_session_cookies(context: BrowserContext, session: aiohttp.ClientSession) -> None:
+    """Copy Naver cookies from the browser context into the aiohttp session."""
+    cookies = await context.cookies(_NAVER_ORIGIN)
+    session.cookie_jar.update_cookies(
+        {c["name"]: c["value"] for c in cookies},
+        response_url=URL(_NAVER_ORIGIN),
+    )
+    log.debug("Copied %d cookies into HTTP session", len(cookies))
+
+
+# ── XHR fetch via aiohttp ─────────────────────────────────────────────────────
 
 _NAVER_API = "https://new.land.naver.com/api/articles/complex/{complex_id}"
 _NAVER_HEADERS = {
     "Accept": "application/json, text/plain, */*",
     "Referer": "https://new.land.naver.com/",
 }
+_PAGE_SIZE = 20
+# Query params that are identical for every request
+_BASE_PARAMS = {"realEstateType": "APT", "pageSize": str(_PAGE_SIZE)}
 
 _MAX_RETRIES = 3
+_MAX_BACKOFF = 60.0  # seconds
+_HTTP_TIMEOUT = aiohttp.ClientTimeout(total=30)
+_CONNECTION_LIMIT = 64  # total pooled connections across all workers
+
+
+def build_connector(proxy_url: str, per_host: int) -> aiohttp.BaseConnector:
+    """Connector shared by every worker session.
+
+    aiohttp's own `proxy=` only speaks HTTP CONNECT, so when PROXY_URL is set
+    the connector itself tunnels through it (http://, socks4://, socks5://).
+    An unsupported scheme raises here, before any browser is launched.
+    `per_host` (MAX_CONCURRENT_REQUESTS) is the only cap on in-flight API
+    requests across workers.
+    """
+    if not proxy_url:
+        return aiohttp.TCPConnector(limit=_CONNECTION_LIMIT, limit_per_host=per_host)
+    try:
+        return ProxyConnector.from_url(proxy_url, limit=_CONNECTION_LIMIT, limit_per_host=per_host)
+    except ValueError as exc:
+        raise ValueError(f"PROXY_URL must be an http, socks4 or socks5 URL: {exc}") from exc
+
+
+def build_http_session(connector: aiohttp.BaseConnector, ua: str) -> aiohttp.ClientSession:
+    """Create an HTTP session on the shared connector with its own cookie jar.
+
+    Each browser identity gets its own jar + UA so cookies stay paired with
+    the fingerprint that obtained them; connections are pooled via `connector`.
+    """
+    return aiohttp.ClientSession(
+        connector=connector,
+        connector_owner=False,
+        cookie_jar=aiohttp.CookieJar(),
+        headers={**_NAVER_HEADERS, "User-Agent": ua, "Accept-Language": _ACCEPT_LANGUAGE},
+        timeout=_HTTP_TIMEOUT,
+    )
+
+
+def _build_limiter(rps: float) -> AsyncLimiter:
+    """Shared request limiter for `rps` requests/s.
+
+    aiolimiter can't grant a slot when max_rate < 1, so slower rates are
+    expressed as one request per 1/rps seconds instead.
+    """
+    rps = max(rps, 0.1)
+    if rps < 1:
+        return AsyncLimiter(1, 1 / rps)
+    return AsyncLimiter(rps, 1.0)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: ~2s, 4s, 8s … capped at _MAX_BACKOFF."""
+    return min(_MAX_BACKOFF, 2 ** attempt + random.random())
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
 
 
 async def fetch_articles_page(
-    page: Page,
+    session: aiohttp.ClientSession,
+    limiter: AsyncLimiter,
     complex_id: str,
     trade_type: str,
     page_num: int,
 ) -> dict[str, Any]:
     """Fetch one page of articles from Naver's XHR API.
 
-    Uses page.evaluate so the request carries session cookies.
-    Retries up to _MAX_RETRIES times on 429 / network errors.
+    `session` must already hold the warm-up cookies (see copy_session_cookies).
+    Every attempt reserves a slot on the shared `limiter` first. Retries up to
+    _MAX_RETRIES times on 429 / network errors, honouring Retry-After when
+    present and otherwise backing off exponentially.
     """
     url = _NAVER_API.format(complex_id=complex_id)
     params = {
-        "realEstateType": "APT",
+        **_BASE_PARAMS,
         "tradeType": trade_type,
         "page": str(page_num),
-        "pageSize": "20",
         "complexNo": complex_id,
     }
-    qs = "&".join(f"{k}={v}" for k, v in params.items())
-    full_url = f"{url}?{qs}"
-
-    js = f"""
-    async () => {{
-        const resp = await fetch({json.dumps(full_url)}, {{
-            method: 'GET',
-            credentials: 'include',
-            headers: {json.dumps(_NAVER_HEADERS)},
-        }});
-        if (!resp.ok) {{
-            return {{ _status: resp.status, _error: resp.statusText }};
-        }}
-        const data = await resp.json();
-        data._status = resp.status;
-        return data;
-    }}
-    """
 
     for attempt in range(1, _MAX_RETRIES + 1):
         try:
-            result: dict = await page.evaluate(js)
+            async with limiter:
+                async with session.get(url, params=params) as resp:
+                    status = resp.status
+                    if status < 400:
+                        return await resp.json(content_type=None)
+                    retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
         except Exception as exc:
-            log.warning("Attempt %d/%d: evaluate error: %s", attempt, _MAX_RETRIES, exc)
+            log.warning("Attempt %d/%d: request error: %s", attempt, _MAX_RETRIES, exc)
             if attempt == _MAX_RETRIES:
                 return {}
-            await async_random_sleep(2.0 * attempt, 4.0 * attempt)
+            await asyncio.sleep(_backoff_delay(attempt))
             continue
 
-        status = result.get("_status", 200)
-        if status == 429:
-            wait = 5.0 * attempt
-            log.warning("Rate-limited (429) on attempt %d — waiting %.0fs", attempt, wait)
-            await asyncio.sleep(wait)
-            continue
-        if status and status >= 400:
-            log.error("HTTP %d on %s", status, full_url)
+        if status != 429:
+            log.error("HTTP %d on %s (page=%d)", status, url, page_num)
             return {}
-        return result
+        if attempt == _MAX_RETRIES:
+            log.error("Still rate-limited after %d attempts on %s (page=%d)", attempt, url, page_num)
+            return {}
+
+        wait = min(_MAX_BACKOFF, retry_after) if retry_after is not None else _backoff_delay(attempt)
+        log.warning("Rate-limited (429) on attempt %d — waiting %.1fs", attempt, wait)
+        await asyncio.sleep(wait)
 
     return {}
 
@@ -183,32 +270,41 @@ async def fetch_articles_page(
 
 def parse_article(article: dict, complex_id: str, today: str, trade_type: str) -> Listing | None:
     """Map a Naver API article dict to a Listing dataclass."""
+    g = article.get  # bound once; this runs for every scraped article
     try:
-        listing_id = str(article.get("articleNo", ""))
-        if not listing_id:
+        listing_id = g("articleNo")
+        if listing_id is None or listing_id == "":
             return None
+        if not isinstance(listing_id, str):
+            listing_id = str(listing_id)
 
-        price_raw = article.get("dealOrWarrantPrc", "") or article.get("rentPrc", "")
-        price, monthly = _parse_price_field(str(price_raw), trade_type)
+        price_raw = g("dealOrWarrantPrc") or g("rentPrc") or ""
+        if not isinstance(price_raw, str):
+            price_raw = str(price_raw)
+        price, monthly = _parse_price_field(price_raw, trade_type)
 
-        area_str = str(article.get("area2", article.get("area1", "0"))).replace("㎡", "").strip()
+        area_raw = g("area2") or g("area1") or "0"
+        if isinstance(area_raw, str):
+            area_raw = area_raw.replace("㎡", "")
         try:
-            area_m2 = float(area_str)
+            area_m2 = float(area_raw)
         except ValueError:
             area_m2 = 0.0
 
-        floor_str = str(article.get("floorInfo", "0/0"))
-        floor_parts = floor_str.split("/")
+        floor_raw = g("floorInfo") or "0/0"
+        if not isinstance(floor_raw, str):
+            floor_raw = str(floor_raw)
+        floor_parts = floor_raw.split("/")
         try:
-            floor = int(floor_parts[0].strip())
+            floor = int(floor_parts[0])
         except ValueError:
             floor = 0
         try:
-            total_floors = int(floor_parts[1].strip()) if len(floor_parts) > 1 else 0
+            total_floors = int(floor_parts[1]) if len(floor_parts) > 1 else 0
         except ValueError:
             total_floors = 0
 
-        tags = article.get("tagList", [])
+        tags = g("tagList", [])
         tags_str = ",".join(tags) if isinstance(tags, list) else str(tags)
 
         return Listing(
@@ -221,47 +317,56 @@ def parse_article(article: dict, complex_id: str, today: str, trade_type: str) -
             area_m2=area_m2,
             floor=floor,
             total_floors=total_floors,
-            direction=article.get("direction", ""),
-            article_name=article.get("articleName", ""),
-            agent_name=article.get("realtorName", ""),
-            confirmed_type=article.get("articleConfirmYmd", ""),
-            description=article.get("articleFeatureDesc", ""),
+            direction=g("direction", ""),
+            article_name=g("articleName", ""),
+            agent_name=g("realtorName", ""),
+            confirmed_type=g("articleConfirmYmd", ""),
+            description=g("articleFeatureDesc", ""),
             tags=tags_str,
         )
     except Exception as exc:
-        log.warning("parse_article failed for %s: %s", article.get("articleNo"), exc)
+        log.warning("parse_article failed for %s: %s", g("articleNo"), exc)
         return None
 
 
 # ── Paginated scrape for one complex × trade_type ─────────────────────────────
 
 async def scrape_complex(
-    page: Page,
+    session: aiohttp.ClientSession,
     complex_id: str,
     trade_type: str,
     today: str,
+    limiter: AsyncLimiter,
 ) -> list[Listing]:
-    """Scrape all pages for one complex + trade type."""
+    """Scrape all pages for one complex + trade type.
+
+    `limiter` caps the request rate; in-flight requests are bounded by the
+    shared connector's per-host limit (see build_connector).
+    """
     listings: list[Listing] = []
     page_num = 1
-    max_listings = config.MAX_LISTINGS_PER_COMPLEX
+    max_listings = config.load_config().max_listings_per_complex
 
     while len(listings) < max_listings:
         log.info(
             "Fetching complex=%s trade=%s page=%d (collected=%d)",
             complex_id, trade_type, page_num, len(listings),
         )
-        data = await fetch_articles_page(page, complex_id, trade_type, page_num)
+        data = await fetch_articles_page(session, limiter, complex_id, trade_type, page_num)
 
-        articles: list[dict] = data.get("articleList", [])
+        # Pop so the response dict doesn't keep the raw page alive
+        articles: list[dict] | None = data.pop("articleList", None)
         if not articles:
             log.info("No more articles at page %d — stopping", page_num)
             break
 
-        for article in articles:
-            listing = parse_article(article, complex_id, today, trade_type)
-            if listing:
-                listings.append(listing)
+        # Parse lazily and stop once the per-complex budget is filled
+        parsed = (parse_article(a, complex_id, today, trade_type) for a in articles)
+        listings.extend(islice(filter(None, parsed), max_listings - len(listings)))
+
+        if len(listings) >= max_listings:
+            log.info("Reached MAX_LISTINGS_PER_COMPLEX=%d — stopping", max_listings)
+            break
 
         # Check if there are more pages
         is_more = data.get("isMoreData", False)
@@ -269,7 +374,7 @@ async def scrape_complex(
             break
 
         page_num += 1
-        await async_random_sleep()
+        await async_random_sleep(coalesce=True)
 
     log.info(
         "complex=%s trade=%s → %d listings", complex_id, trade_type, len(listings)
@@ -277,6 +382,108 @@ async def scrape_complex(
     return listings
 
 
+# ── Worker pool ───────────────────────────────────────────────────────────────
+
+Job = tuple[str, str]  # (complex_id, trade_type)
+
+
+@dataclass(eq=False)
+class _Identity:
+    """One browser fingerprint: stealth context + page + matching HTTP session.
+
+    Shared by every worker assigned the same UA, so warm-up happens once per
+    complex per identity rather than once per worker.
+    """
+
+    ua: str
+    context: BrowserContext
+    page: Page
+    session: aiohttp.ClientSession
+    warmed: set[str] = field(default_factory=set)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+async def _build_identities(
+    browser: Browser, connector: aiohttp.BaseConnector, n_workers: int
+) -> list[_Identity]:
+    """Return one identity per worker, creating at most one context per UA.
+
+    UAs are chosen once per worker up front; workers that draw the same UA
+    reuse the cached context instead of paying for a new one.
+    """
+    uas = random.sample(_USER_AGENTS, k=min(n_workers, len(_USER_AGENTS)))
+    by_ua: dict[str, _Identity] = {}
+    try:
+        for ua in uas:
+            context = await build_browser_context(browser, ua)
+            try:
+                page = await context.new_page()
+                await stealth_async(page)
+            except BaseException:
+                await context.close()
+                raise
+            by_ua[ua] = _Identity(ua, context, page, build_http_session(connector, ua))
+    except BaseException:
+        # The caller never receives a partial list, so release what was built
+        await _close_identities(by_ua.values())
+        raise
+    log.info("Built %d browser contexts for %d workers", len(by_ua), n_workers)
+    return [by_ua[uas[i % len(uas)]] for i in range(n_workers)]
+
+
+async def _close_identities(identities: Iterable[_Identity]) -> None:
+    """Close each distinct identity's HTTP session and browser context once."""
+    for identity in dict.fromkeys(identities):  # dedupe shared identities
+        await identity.session.close()
+        await identity.context.close()
+
+
+async def _ensure_warm(identity: _Identity, complex_id: str) -> None:
+    """Warm up `identity` for `complex_id` once and copy its cookies over."""
+    async with identity.lock:
+        if complex_id in identity.warmed:
+            return
+        await warm_up_session(identity.page, complex_id)
+        await copy_session_cookies(identity.context, identity.session)
+        identity.warmed.add(complex_id)
+
+
+async def _scrape_worker(
+    worker_id: int,
+    identity: _Identity,
+    queue: asyncio.Queue[Job],
+    limiter: AsyncLimiter,
+    today: str,
+) -> dict[Job, list[Listing]]:
+    """Drain jobs from `queue` using the given browser identity.
+
+    The identity's page is only used for warm-up; article fetches go through
+    its HTTP session.
+    """
+    collected: dict[Job, list[Listing]] = {}
+
+    while True:
+        try:
+            complex_id, trade_type = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+
+        await _ensure_warm(identity, complex_id)
+
+        try:
+            collected[(complex_id, trade_type)] = await scrape_complex(
+                identity.session, complex_id, trade_type, today, limiter
+            )
+        except Exception as exc:
+            log.error(
+                "Worker %d: error scraping complex=%s trade=%s: %s",
+                worker_id, complex_id, trade_type, exc,
+            )
+        await async_random_sleep(coalesce=True)
+
+    return collected
+
+
 # ── Top-level entry point ─────────────────────────────────────────────────────
 
 async def run_scraper(
@@ -285,41 +492,53 @@ async def run_scraper(
 ) -> dict[str, list[Listing]]:
     """Scrape all complexes × trade types.
 
+    Jobs are fanned out over SCRAPER_WORKERS workers (sharing up to one
+    browser context per UA), with at most MAX_CONCURRENT_REQUESTS API
+    requests in flight and REQUESTS_PER_SECOND started per second.
+
     Returns:
         dict mapping complex_id → list[Listing]  (all trade types combined)
     """
-    ids = complex_ids or config.COMPLEX_IDS
-    types = trade_types or config.TRADE_TYPES
+    cfg = config.load_config()
+    ids = list(complex_ids or cfg.complex_ids)
+    types = list(trade_types or cfg.trade_types)
     today = date.today().isoformat()
 
-    results: dict[str, list[Listing]] = {cid: [] for cid in ids}
+    jobs: list[Job] = [(cid, tt) for cid in ids for tt in types]
+    queue: asyncio.Queue[Job] = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
 
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=config.HEADLESS)
-        context = await build_browser_context(browser)
+    n_workers = max(1, min(cfg.scraper_workers, len(jobs)))
+    limiter = _build_limiter(cfg.requests_per_second)
+    log.info("Scraping %d jobs with %d workers", len(jobs), n_workers)
 
-        try:
-            page = await context.new_page()
-            await stealth_async(page)
-
-            for complex_id in ids:
-                # Warm up once per complex
-                await warm_up_session(page, complex_id)
-
-                for trade_type in types:
-                    try:
-                        listings = await scrape_complex(page, complex_id, trade_type, today)
-                        results[complex_id].extend(listings)
-                    except Exception as exc:
-                        log.error(
-                            "Error scraping complex=%s trade=%s: %s",
-                            complex_id, trade_type, exc,
-                        )
-                    await async_random_sleep()
+    connector = build_connector(cfg.proxy_url, max(1, cfg.max_concurrent_requests))
 
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=cfg.headless)
+        identities: list[_Identity] = []
+        try:
+            identities = await _build_identities(browser, connector, n_workers)
+            partials = await asyncio.gather(
+                *(
+                    _scrape_worker(i, identity, queue, limiter, today)
+                    for i, identity in enumerate(identities)
+                )
+            )
         finally:
-            await context.close()
+            await _close_identities(identities)
             await browser.close()
+            await connector.close()
+
+    # Merge in job order so output is deterministic regardless of scheduling
+    collected: dict[Job, list[Listing]] = {}
+    for partial in partials:
+        collected.update(partial)
+
+    results: dict[str, list[Listing]] = {cid: [] for cid in ids}
+    for job in jobs:
+        results[job[0]].extend(collected.get(job, []))
 
     total = sum(len(v) for v in results.values())
     log.info("Scraping complete — total listings: %d", total)
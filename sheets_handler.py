@@ -8,16 +8,26 @@ Supports two credential modes:
 
 from __future__ import annotations
 
-import json
+import contextlib
+import operator
+import random
 import time
 from datetime import date, timedelta
+from typing import Any, Callable, Iterator
 
 import gspread
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+
+try:
+    from orjson import loads as _loads
+except ImportError:  # optional speed-up; stdlib json is fine
+    from json import loads as _loads
 
 import config
 from models import Listing
-from utils import get_logger
+from utils import TokenBucket, get_logger
 
 log = get_logger("sheets")
 
@@ -43,19 +53,95 @@ _HEADERS = [
     "description",
     "tags",
 ]
+_LAST_COL = chr(ord("A") + len(_HEADERS) - 1)  # 'O'
+# Listing → row tuple in column order; header names mirror Listing's fields
+_ROW_GETTER = operator.attrgetter(*_HEADERS)
+_DATA_RANGE = f"A2:{_LAST_COL}"                # every data row, header excluded
+# Keep each values update well under the Sheets per-request payload limit
+_CHUNK_CELLS = 10_000
+_CHUNK_ROWS = max(1, _CHUNK_CELLS // len(_HEADERS))
+
+# Per-process caches — avoid repeat round-trips for the same resources
+_CREDS: Credentials | None = None
+_CLIENT: gspread.Client | None = None
+_SPREADSHEET: gspread.Spreadsheet | None = None
+_READ_CACHE: dict[tuple[str, str], list[dict]] = {}
+
+# Keep-alive pool for the shared Sheets/Drive HTTP session
+_HTTP_POOLS = 16
+_HTTP_POOL_SIZE = 32
+
+# Retry policy for transient Sheets API errors
+_RETRY_STATUSES = frozenset({429, 500, 503})
+_RATE_LIMIT_ONLY = frozenset({429})
+_MAX_ATTEMPTS = 6
+_BACKOFF_BASE = 1.0   # seconds
+_BACKOFF_CAP = 90.0   # seconds
+
+# Proactive pacing shared by all Sheets calls (thread-safe for concurrent callers)
+_BUCKET = TokenBucket(rate=1.5, burst=5)
+
+
+# ── Retry ──────────────────────────────────────────────────────────────────────
+
+def _with_retry(
+    fn: Callable[..., Any],
+    *args: Any,
+    retry_statuses: frozenset[int] = _RETRY_STATUSES,
+    **kwargs: Any,
+) -> Any:
+    """Call a gspread API method, retrying 429/500/503 with backoff + jitter.
+
+    Honours the Retry-After header when present; otherwise waits
+    min(_BACKOFF_CAP, _BACKOFF_BASE * 2**attempt) plus up to 1s of jitter.
+    Other errors (and the final failed attempt) are re-raised. Every attempt
+    first takes a token from _BUCKET, so bursts are paced before they trip
+    the quota rather than after. Pass `retry_statuses=_RATE_LIMIT_ONLY` for
+    calls that aren't idempotent: a 5xx may follow a request the server
+    already applied, while a 429 never does.
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        _BUCKET.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as exc:
+            status = exc.response.status_code
+            if status not in retry_statuses or attempt == _MAX_ATTEMPTS - 1:
+                raise
+            retry_after = exc.response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = min(_BACKOFF_CAP, float(retry_after))
+            else:
+                delay = min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt) + random.uniform(0, 1)
+            log.warning(
+                "Sheets API %d on %s (attempt %d/%d) — retrying in %.1fs",
+                status, getattr(fn, "__name__", fn), attempt + 1, _MAX_ATTEMPTS, delay,
+            )
+            time.sleep(delay)
 
 
 # ── Auth ───────────────────────────────────────────────────────────────────────
 
-def _get_client() -> gspread.Client:
-    """Build gspread client from env-configured credentials."""
-    raw_json = config.GOOGLE_SERVICE_ACCOUNT_JSON_CONTENT
+def _get_credentials() -> Credentials:
+    """Load service-account credentials from env config.
+
+    Built once per process and refreshed up front, so the first token fetch
+    happens here rather than inside the first API call, where concurrent
+    callers could race on it.
+    google-auth refreshes the cached token on its own when it expires.
+    """
+    global _CREDS
+    if _CREDS is not None:
+        return _CREDS
+
+    cfg = config.load_config()
+    raw_json = cfg.google_service_account_json_content
     if raw_json and raw_json.strip():
-        info = json.loads(raw_json)
+        info = _loads(raw_json)
         creds = Credentials.from_service_account_info(info, scopes=_SCOPES)
         log.info("Authenticated via GOOGLE_SERVICE_ACCOUNT_JSON_CONTENT")
     else:
-        path = config.GOOGLE_SERVICE_ACCOUNT_JSON
+        path = cfg.google_service_account_json
         if not path:
             raise ValueError(
                 "Set GOOGLE_SERVICE_ACCOUNT_JSON (file path) or "
@@ -63,7 +149,29 @@ def _get_client() -> gspread.Client:
             )
         creds = Credentials.from_service_account_file(path, scopes=_SCOPES)
         log.info("Authenticated via file: %s", path)
-    return gspread.authorize(creds)
+    creds.refresh(Request())
+    _CREDS = creds
+    return _CREDS
+
+
+def _get_client() -> gspread.Client:
+    """Build gspread client from env-configured credentials.
+
+    The authorized client and its pooled HTTP session are built once and
+    reused for the rest of the process.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        creds = _get_credentials()
+        # Keep-alive pool shared by every caller, so repeat calls reuse open TLS connections;
+        # urllib3 retries stay off because _with_retry owns the retry policy
+        session = AuthorizedSession(creds)
+        session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=_HTTP_POOLS, pool_maxsize=_HTTP_POOL_SIZE, max_retries=0),
+        )
+        _CLIENT = gspread.Client(auth=creds, session=session)
+    return _CLIENT
 
 
 # ── Spreadsheet / worksheet management ────────────────────────────────────────
@@ -72,23 +180,31 @@ def get_or_create_spreadsheet(gc: gspread.Client) -> gspread.Spreadsheet:
     """Return existing spreadsheet or create a new one.
 
     On first run (GOOGLE_SPREADSHEET_ID is blank), creates the sheet,
-    shares it with GOOGLE_SHARE_EMAIL, and logs the new ID.
+    shares it with GOOGLE_SHARE_EMAIL, and logs the new ID. The handle is
+    cached, so later calls in the same process neither re-open nor re-create.
     """
-    spreadsheet_id = config.GOOGLE_SPREADSHEET_ID
+    global _SPREADSHEET
+    if _SPREADSHEET is not None:
+        return _SPREADSHEET
+
+    cfg = config.load_config()
+    spreadsheet_id = cfg.google_spreadsheet_id
     if spreadsheet_id:
         log.info("Opening spreadsheet: %s", spreadsheet_id)
-        return gc.open_by_key(spreadsheet_id)
+        _SPREADSHEET = _with_retry(gc.open_by_key, spreadsheet_id)
+        return _SPREADSHEET
 
     # First run — create new
-    sh = gc.create("Naver Real Estate Data")
+    sh = _with_retry(gc.create, "Naver Real Estate Data", retry_statuses=_RATE_LIMIT_ONLY)
     log.info("Created new spreadsheet. ID: %s", sh.id)
     log.info(">> Set GOOGLE_SPREADSHEET_ID=%s in .env and GitHub Secrets <<", sh.id)
 
-    email = config.GOOGLE_SHARE_EMAIL
+    email = cfg.google_share_email
     if email:
-        sh.share(email, perm_type="user", role="writer")
+        _with_retry(sh.share, email, perm_type="user", role="writer")
         log.info("Shared with %s", email)
 
+    _SPREADSHEET = sh
     return sh
 
 
@@ -97,42 +213,56 @@ def get_or_create_worksheet(
 ) -> gspread.Worksheet:
     """Return existing worksheet or create one with headers."""
     try:
-        ws = sh.worksheet(tab_name)
+        ws = _with_retry(sh.worksheet, tab_name)
         log.info("Opened existing tab: %s", tab_name)
         return ws
     except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=tab_name, rows=5000, cols=len(_HEADERS))
-        ws.append_row(_HEADERS, value_input_option="RAW")
-        log.info("Created new tab: %s", tab_name)
-        return ws
+        pass
+
+    try:
+        ws = _with_retry(sh.add_worksheet, title=tab_name, rows=5000, cols=len(_HEADERS))
+    except gspread.exceptions.APIError as exc:
+        # A retried add whose earlier attempt did land reports a duplicate name
+        if exc.response.status_code != 400 or "already exists" not in str(exc):
+            raise
+        ws = _with_retry(sh.worksheet, tab_name)
+    # Explicit range rather than append, so a retried header write can't duplicate it
+    _with_retry(
+        ws.update,
+        values=[_HEADERS],
+        range_name=f"A1:{_LAST_COL}1",
+        value_input_option="RAW",
+    )
+    log.info("Created new tab: %s", tab_name)
+    return ws
 
 
 # ── Read / Write ───────────────────────────────────────────────────────────────
 
-def _listing_to_row(listing: Listing) -> list:
-    return [
-        listing.listing_id,
-        listing.complex_id,
-        listing.trade_type,
-        listing.date,
-        listing.price,
-        listing.monthly_rent,
-        listing.area_m2,
-        listing.floor,
-        listing.total_floors,
-        listing.direction,
-        listing.article_name,
-        listing.agent_name,
-        listing.confirmed_type,
-        listing.description,
-        listing.tags,
-    ]
-
-
-def write_listings(listings: list[Listing]) -> None:
-    """Write all listings to today's tab in a single batch call."""
+@contextlib.contextmanager
+def pipeline_session() -> Iterator[tuple[gspread.Client, gspread.Spreadsheet]]:
+    """Open the client and spreadsheet once for a pipeline run.
+
+    Yields (gc, sh) for passing to write_listings / read_yesterday; memoized
+    worksheet reads are dropped on exit.
+    """
     gc = _get_client()
     sh = get_or_create_spreadsheet(gc)
+    try:
+        yield gc, sh
+    finally:
+        clear_read_cache()
+
+
+def write_listings(listings: list[Listing], sh: gspread.Spreadsheet | None = None) -> None:
+    """Write all listings to today's tab.
+
+    Clears the data range (header preserved) and writes the rows in chunks of
+    at most _CHUNK_CELLS cells — no read-back of the existing sheet is needed.
+    Pass `sh` (e.g. from pipeline_session) to reuse an open spreadsheet.
+    """
+    if sh is None:
+        sh = get_or_create_spreadsheet(_get_client())
     today = date.today().isoformat()
     ws = get_or_create_worksheet(sh, today)
 
@@ -140,43 +270,87 @@ def write_listings(listings: list[Listing]) -> None:
         log.info("No listings to write for %s", today)
         return
 
-    # Clear existing rows (skip header row) to avoid duplicates on re-run
-    existing = ws.get_all_values()
-    if len(existing) > 1:
-        ws.delete_rows(2, len(existing))
-        log.info("Cleared %d existing data rows", len(existing) - 1)
-
-    rows = [_listing_to_row(l) for l in listings]
-    ws.append_rows(rows, value_input_option="RAW")
+    rows = list(map(_ROW_GETTER, listings))
+    end_row = len(rows) + 1
+    if ws.row_count < end_row:
+        # Only the grid growth is appended; a retried add_rows just leaves spare rows
+        _with_retry(ws.add_rows, end_row - ws.row_count)
+
+    # Clear first so a shorter re-run leaves no stale rows behind
+    _with_retry(ws.batch_clear, [_DATA_RANGE])
+    # Explicit ranges keep every chunk idempotent: a retry after a 5xx that the
+    # server had in fact applied rewrites the same cells instead of duplicating rows
+    for i in range(0, len(rows), _CHUNK_ROWS):
+        chunk = rows[i:i + _CHUNK_ROWS]
+        _with_retry(
+            ws.update,
+            values=chunk,
+            range_name=f"A{2 + i}:{_LAST_COL}{1 + i + len(chunk)}",
+            value_input_option="RAW",
+        )
+    # A memoized read of this tab is now stale
+    _READ_CACHE.pop((sh.id, today), None)
     log.info("Wrote %d listings to tab '%s'", len(rows), today)
 
 
-def read_worksheet(sh: gspread.Spreadsheet, tab_name: str) -> list[dict]:
-    """Read a named tab and return list of dicts. Returns [] if tab absent."""
+def iter_worksheet(sh: gspread.Spreadsheet, tab_name: str) -> Iterator[dict]:
+    """Yield a named tab's rows as dicts. Yields nothing if the tab is absent.
+
+    Fetches only the data range (header skipped — every tab is written with
+    _HEADERS) as unformatted values and zips each row with _HEADERS as it is
+    consumed, so callers that filter never hold a full list of dicts.
+    Not memoized; see read_worksheet().
+    """
     try:
-        ws = sh.worksheet(tab_name)
-        records = ws.get_all_records()
-        log.info("Read %d records from tab '%s'", len(records), tab_name)
-        return records
+        ws = _with_retry(sh.worksheet, tab_name)
     except gspread.WorksheetNotFound:
-        log.info("Tab '%s' not found — returning empty list", tab_name)
-        return []
+        log.info("Tab '%s' not found — no rows", tab_name)
+        return
+    values = _with_retry(
+        ws.get_values, _DATA_RANGE, value_render_option="UNFORMATTED_VALUE"
+    )
+    for row in values:
+        if any(row):
+            yield dict(zip(_HEADERS, row))
 
 
-def read_yesterday(trade_type: str) -> list[dict]:
+def read_worksheet(sh: gspread.Spreadsheet, tab_name: str) -> list[dict]:
+    """Read a named tab and return list of dicts. Returns [] if tab absent.
+
+    Results of iter_worksheet() are memoized per (spreadsheet_id, tab_name)
+    for the lifetime of the process; call clear_read_cache() to force a
+    re-read.
+    """
+    key = (sh.id, tab_name)
+    if key in _READ_CACHE:
+        log.info("Using cached records for tab '%s'", tab_name)
+        return _READ_CACHE[key]
+
+    records = list(iter_worksheet(sh, tab_name))
+    log.info("Read %d records from tab '%s'", len(records), tab_name)
+    _READ_CACHE[key] = records
+    return records
+
+
+def clear_read_cache() -> None:
+    """Drop memoized worksheet reads (for long-lived processes)."""
+    _READ_CACHE.clear()
+
+
+def read_yesterday(trade_type: str, sh: gspread.Spreadsheet | None = None) -> list[dict]:
     """Load yesterday's tab rows for delta computation.
 
     Returns [] if yesterday's tab doesn't exist (first run).
     """
-    gc = _get_client()
-    sh = get_or_create_spreadsheet(gc)
+    if sh is None:
+        sh = get_or_create_spreadsheet(_get_client())
     yesterday = (date.today() - timedelta(days=1)).isoformat()
-    rows = read_worksheet(sh, yesterday)
-    # Filter to matching trade_type
-    return [r for r in rows if r.get("trade_type") == trade_type]
+    # Filter to matching trade_type while streaming, unless already memoized
+    rows = _READ_CACHE.get((sh.id, yesterday))
+    source = rows if rows is not None else iter_worksheet(sh, yesterday)
+    return [r for r in source if r.get("trade_type") == trade_type]
 
 
 def get_spreadsheet() -> gspread.Spreadsheet:
-    """Convenience: return the configured spreadsheet (used by main.py)."""
-    gc = _get_client()
-    return get_or_create_spreadsheet(gc)
+    """Convenience: return the configured spreadsheet."""
+    return get_or_create_spreadsheet(_get_client())
@@ -1,9 +1,11 @@
-"""Shared utilities: logger, sleep helpers."""
+"""Shared utilities: logger, sleep helpers, token bucket."""
 
 import asyncio
 import logging
 import random
+import threading
 import time
+import weakref
 
 import config
 
@@ -11,8 +13,9 @@ import config
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
+    format="{asctime} [{levelname}] {name} — {message}",
     datefmt="%Y-%m-%d %H:%M:%S",
+    style="{",
 )
 
 
@@ -20,23 +23,79 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
 
 
+_LOG = get_logger("utils")
+
+
 # ── Sleep helpers ──────────────────────────────────────────────────────────────
 
 def random_sleep(min_s: float | None = None, max_s: float | None = None) -> None:
     """Synchronous random sleep to avoid rate-limit detection."""
-    lo = min_s if min_s is not None else config.SLEEP_MIN
-    hi = max_s if max_s is not None else config.SLEEP_MAX
+    cfg = config.load_config()
+    lo = min_s if min_s is not None else cfg.sleep_min
+    hi = max_s if max_s is not None else cfg.sleep_max
     duration = random.uniform(lo, hi)
-    get_logger("utils").debug("Sleeping %.2fs", duration)
+    if _LOG.isEnabledFor(logging.DEBUG):
+        _LOG.debug("Sleeping %.2fs", duration)
     time.sleep(duration)
 
 
+# Monotonic time each task last woke from a coalesced async_random_sleep
+_LAST_WAKE: weakref.WeakKeyDictionary[asyncio.Task, float] = weakref.WeakKeyDictionary()
+
+
 async def async_random_sleep(
-    min_s: float | None = None, max_s: float | None = None
+    min_s: float | None = None, max_s: float | None = None, *, coalesce: bool = False
 ) -> None:
-    """Async random sleep (non-blocking)."""
-    lo = min_s if min_s is not None else config.SLEEP_MIN
-    hi = max_s if max_s is not None else config.SLEEP_MAX
+    """Async random sleep (non-blocking).
+
+    With `coalesce=True` the random duration is a target interval between
+    consecutive coalesced wake-ups of the calling task: time already spent
+    since its previous one (e.g. on a slow request) counts toward it, so only
+    the remainder is slept. Use it for pacing between requests, not for waits
+    that must last their full duration.
+    """
+    cfg = config.load_config()
+    lo = min_s if min_s is not None else cfg.sleep_min
+    hi = max_s if max_s is not None else cfg.sleep_max
     duration = random.uniform(lo, hi)
-    get_logger("utils").debug("Async sleeping %.2fs", duration)
-    await asyncio.sleep(duration)
+
+    task = asyncio.current_task() if coalesce else None
+    last = _LAST_WAKE.get(task) if task else None
+    remaining = duration - (time.monotonic() - last) if last is not None else duration
+    if _LOG.isEnabledFor(logging.DEBUG):
+        _LOG.debug("Async sleeping %.2fs (target %.2fs)", max(remaining, 0.0), duration)
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+    if task:
+        _LAST_WAKE[task] = time.monotonic()
+
+
+# ── Token bucket ───────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Thread-safe token bucket for pacing synchronous API calls.
+
+    Allows bursts of up to `burst` calls, then refills at `rate` tokens/s.
+    acquire() only blocks when the bucket is empty, unlike a fixed sleep
+    before every call.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)